@@ -1,6 +1,7 @@
 import requests
 from typing import Dict, Optional
 from azure.identity import ClientSecretCredential
+from request_coalescing import flight
 
 class AzureAuthenticator:
     def __init__(self, tenant_id: str, client_id: str, client_secret: str):
@@ -14,6 +15,7 @@ class AzureAuthenticator:
         )
         # Add Microsoft Graph scope and token URL
         self.scope = "https://management.azure.com/.default"
+        self.graph_scope = "https://graph.microsoft.com/.default"
         self.token_url = f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
     
     def get_access_token(self) -> Optional[str]:
@@ -25,7 +27,10 @@ class AzureAuthenticator:
                 'scope': self.scope
             }
             
-            response = requests.post(self.token_url, data=data)
+            # Concurrent scans share one token request instead of each posting their own
+            response = flight.do(
+                ("token", self.token_url, self.client_id, self.scope),
+                lambda: requests.post(self.token_url, data=data))
             
             if response.status_code == 200:
                 return response.json().get('access_token')
@@ -37,6 +42,10 @@ class AzureAuthenticator:
             print(f"Authentication error: {str(e)}")
             return None
 
+    def request_scope(self, scope: str) -> str:
+        """Identity and token audience, used to key coalesced requests"""
+        return f"{self.tenant_id}/{self.client_id}/{scope}"
+
     def get_headers(self) -> Dict[str, str]:
         token = self.get_access_token()
         if token:
@@ -50,8 +59,10 @@ class AzureAuthenticator:
         """Get headers for Microsoft Graph API calls"""
         try:
             # Get token for Microsoft Graph
-            scope = "https://graph.microsoft.com/.default"
-            token = self.credential.get_token(scope)
+            scope = self.graph_scope
+            token = flight.do(
+                ("graph-token", self.tenant_id, self.client_id, scope),
+                lambda: self.credential.get_token(scope))
             
             if not token:
                 print("Failed to get Microsoft Graph token")
@@ -0,0 +1,75 @@
+from array import array
+from typing import Dict, List, Optional
+
+
+class FindingsIndex:
+    """Two-way index between security recommendations and affected resources
+
+    Recommendation names and resource ids are interned to small integers once,
+    and the links between them are stored as compact unsigned int arrays.
+    """
+
+    def __init__(self):
+        self._resource_ids: List[str] = []
+        self._resource_lookup: Dict[str, int] = {}
+        self._recommendations: List[str] = []
+        self._recommendation_lookup: Dict[str, int] = {}
+        self._severities: List[str] = []
+        self._recommendation_resources: List[array] = []
+        self._resource_recommendations: List[array] = []
+
+    def _intern_resource(self, resource_id: str) -> int:
+        # Azure resource ids are case-insensitive, keep the first spelling for display
+        key = resource_id.lower()
+        index = self._resource_lookup.get(key)
+        if index is None:
+            index = len(self._resource_ids)
+            self._resource_lookup[key] = index
+            self._resource_ids.append(resource_id)
+            self._resource_recommendations.append(array('I'))
+        return index
+
+    def _intern_recommendation(self, name: str, severity: str) -> int:
+        index = self._recommendation_lookup.get(name)
+        if index is None:
+            index = len(self._recommendations)
+            self._recommendation_lookup[name] = index
+            self._recommendations.append(name)
+            self._severities.append(severity)
+            self._recommendation_resources.append(array('I'))
+        return index
+
+    def add(self, recommendation: str, severity: str, resource_id: str) -> None:
+        rec_index = self._intern_recommendation(recommendation, severity)
+        resource_index = self._intern_resource(resource_id)
+        self._recommendation_resources[rec_index].append(resource_index)
+        self._resource_recommendations[resource_index].append(rec_index)
+
+    def __contains__(self, recommendation: str) -> bool:
+        return recommendation in self._recommendation_lookup
+
+    def recommendations(self, severity: Optional[str] = None) -> List[str]:
+        return [
+            name for name, rec_severity in zip(self._recommendations, self._severities)
+            if severity is None or rec_severity == severity
+        ]
+
+    def resource_count(self, recommendation: str) -> int:
+        index = self._recommendation_lookup.get(recommendation)
+        return 0 if index is None else len(self._recommendation_resources[index])
+
+    def resources_for(self, recommendation: str, offset: int = 0, limit: Optional[int] = None) -> List[str]:
+        """Page through the resources affected by a recommendation"""
+        index = self._recommendation_lookup.get(recommendation)
+        if index is None:
+            return []
+        resources = self._recommendation_resources[index]
+        end = len(resources) if limit is None else offset + limit
+        return [self._resource_ids[i] for i in resources[offset:end]]
+
+    def recommendations_for(self, resource_id: str) -> List[str]:
+        """Recommendations that fire for a resource"""
+        index = self._resource_lookup.get(resource_id.lower())
+        if index is None:
+            return []
+        return [self._recommendations[i] for i in self._resource_recommendations[index]]
@@ -0,0 +1,97 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+from request_coalescing import coalesced_get
+
+
+class GroupExpander:
+    """Expand groups into their effective members with a TTL cache
+
+    Groups are expanded through their direct members, and nested groups are
+    expanded recursively through the same cache. A subgroup shared by many
+    privileged groups is therefore fetched from Graph only once per TTL, and
+    the cache is kept for the lifetime of the expander so it is reused across
+    subscriptions and scans.
+    """
+
+    def __init__(self, authenticator, ttl: float = 3600):
+        self.authenticator = authenticator
+        self.ttl = ttl
+        self.graph_url = "https://graph.microsoft.com/v1.0"
+        self._cache: Dict[str, tuple] = {}  # group id -> (expires at, effective members)
+        self._lock = threading.Lock()
+
+    def _cached(self, group_id: str) -> Optional[List[Dict[str, str]]]:
+        with self._lock:
+            entry = self._cache.get(group_id)
+            if entry and entry[0] > time.time():
+                return entry[1]
+            return None
+
+    def _direct_members(self, group_id: str, headers: Dict) -> List[Dict[str, str]]:
+        members = []
+        url = f"{self.graph_url}/groups/{group_id}/members?$select=id,displayName&$top=999"
+        while url:
+            response = coalesced_get(url, headers=headers,
+                                     scope=self.authenticator.request_scope(self.authenticator.graph_scope))
+            response.raise_for_status()
+            data = response.json()
+            for member in data.get('value', []):
+                members.append({
+                    'id': member['id'],
+                    'displayName': member.get('displayName') or member['id'],
+                    'type': member.get('@odata.type', '').split('.')[-1]
+                })
+            url = data.get('@odata.nextLink')
+        return members
+
+    def _expand(self, group_id: str, headers: Dict, order: Dict[str, int], stack: List[str]) -> tuple:
+        """Return (effective members, lowest walk order of a group on a cycle through this one)
+
+        Groups on a membership cycle reach each other, so they all have the same
+        effective members. The first group of a cycle reached by the walk caches
+        that result for every group on the cycle. Groups above the cycle get
+        their own complete result and are cached as usual.
+        """
+        cached = self._cached(group_id)
+        if cached is not None:
+            return cached, float('inf')
+
+        index = order[group_id] = len(order)
+        stack.append(group_id)
+        low = index
+        effective = {}
+        for member in self._direct_members(group_id, headers):
+            if member['type'] == 'group':
+                if member['id'] in order and member['id'] in stack:
+                    # Back to a group still being walked, this group is on its cycle
+                    low = min(low, order[member['id']])
+                    continue
+                nested, nested_low = self._expand(member['id'], headers, order, stack)
+                low = min(low, nested_low)
+                for nested_member in nested:
+                    effective.setdefault(nested_member['id'], nested_member)
+            else:
+                effective.setdefault(member['id'], member)
+
+        members = sorted(effective.values(), key=lambda m: (m['displayName'].lower(), m['id']))
+        if low == index:
+            # Every group above this one on the stack is on the same cycle as this one
+            expires_at = time.time() + self.ttl
+            position = stack.index(group_id)
+            with self._lock:
+                for cycle_group in stack[position:]:
+                    self._cache[cycle_group] = (expires_at, members)
+            del stack[position:]
+        return members, low
+
+    def expand(self, group_id: str, headers: Optional[Dict] = None) -> List[Dict[str, str]]:
+        """Return the users, service principals and devices that are members of a group"""
+        if headers is None:
+            headers = self.authenticator.get_graph_headers()
+        return self._expand(group_id, headers, {}, [])[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
@@ -3,22 +3,34 @@ from tkinter import ttk
 from tkinter import scrolledtext
 import tkinter.font as tkfont
 from subscription_analyzer import AzureOperations
+from scan_diff import diff_scans, format_diff, recommendation_name
+from scanner_service import ScannerServiceClient
+from search_index import SearchIndex
+import datetime
 import re
+import threading
 
 class SecurityAnalyzerGUI:
-    def __init__(self, root, authenticator):
+    def __init__(self, root, authenticator, service_url=None):
         self.root = root
         self.root.title("Azure Subscription Security Inspector")
         self.root.geometry("1200x800") 
         self.authenticator = authenticator
         self.azure_ops = AzureOperations(authenticator)
+        # Optional scanner service to read cached results from instead of scanning Azure
+        self.service = ScannerServiceClient(service_url) if service_url else None
         self.subscriptions = []
+        self.scan_history = {}  # Last results per subscription id, used for change tracking
+        self.search_index = SearchIndex()  # Search across every subscription scanned so far
+        self.current_view = None  # Last analysis shown, restored when the search box is cleared
+        self.showing_search = False
         
         # Define icons for different sections
         self.icons = {
             "Microsoft Defender Status": "🛡️",
             "Security Recommendations": "🔒",
-            "RBAC Settings": "👥"
+            "RBAC Settings": "👥",
+            "Changes Since Last Scan": "🔄"
         }
         
         self.setup_gui()
@@ -168,6 +180,43 @@ class SecurityAnalyzerGUI:
         )
         load_button.pack(fill="x", pady=(0, 15))
 
+        # Search across all indexed subscriptions
+        search_label = ttk.Label(
+            controls_card,
+            text="SEARCH ALL SUBSCRIPTIONS",
+            font=('Segoe UI', 9, 'bold'),
+            foreground=self.colors['text_dim'],
+            background=self.colors['surface']
+        )
+        search_label.pack(anchor="w", pady=(0, 5))
+
+        self.search_entry = ttk.Entry(controls_card, font=('Segoe UI', 10))
+        self.search_entry.pack(fill="x", pady=(0, 5))
+        self.search_entry.bind("<KeyRelease>", lambda event: self.search())
+
+        self.index_button = ttk.Button(
+            controls_card,
+            text="Index All Subscriptions",
+            command=self.index_all_subscriptions,
+            style='Modern.TButton'
+        )
+        self.index_button.pack(fill="x", pady=(0, 15))
+
+        # Resolve privileged groups to the principals that get access through them
+        self.expand_groups_var = tk.BooleanVar(value=self.azure_ops.expand_groups)
+        expand_groups_check = tk.Checkbutton(
+            controls_card,
+            text="Expand privileged groups into members",
+            variable=self.expand_groups_var,
+            command=lambda: setattr(self.azure_ops, 'expand_groups', self.expand_groups_var.get()),
+            font=('Segoe UI', 10),
+            foreground=self.colors['text'],
+            background=self.colors['surface'],
+            activebackground=self.colors['surface'],
+            anchor="w"
+        )
+        expand_groups_check.pack(fill="x", pady=(0, 15))
+
         # Sekcja informacji o subskrypcji z ustaloną szerokością
         self.sub_info_frame = ttk.Frame(controls_card, style='Card.TFrame', padding="15", width=370)
         self.sub_info_frame.pack(fill="x", pady=(0, 15))
@@ -286,8 +335,23 @@ class SecurityAnalyzerGUI:
             }
         }
 
+    def configure_text_tags(self):
+        # Configure text tags with colors
+        for style_name, style_props in self.text_styles.items():
+            self.recommendations_text.tag_configure(
+                style_name,
+                font=style_props["font"],
+                spacing1=style_props["spacing"] * 10,
+                foreground=style_props["foreground"]
+            )
+
     def load_subscriptions(self):
-        self.subscriptions = self.azure_ops.get_subscriptions()
+        if self.service:
+            self.subscriptions = self.service.get_subscriptions()
+            for entry in self.service.get_all_results().values():
+                self.search_index.add_subscription(entry["subscription"], entry["results"])
+        if not self.subscriptions:
+            self.subscriptions = self.azure_ops.get_subscriptions()
         self.sub_dropdown['values'] = []
         if self.subscriptions:
             self.sub_dropdown['values'] = [sub['name'] for sub in self.subscriptions]
@@ -306,24 +370,122 @@ class SecurityAnalyzerGUI:
         if not selected_sub:
             return
             
-        # Configure text tags with colors
-        for style_name, style_props in self.text_styles.items():
-            self.recommendations_text.tag_configure(
-                style_name,
-                font=style_props["font"],
-                spacing1=style_props["spacing"] * 10,
-                foreground=style_props["foreground"]
-            )
+        self.configure_text_tags()
 
         self.status_label.config(text="Status: Analyzing...")
         
-        results = self.azure_ops.analyze_subscription_security(selected_sub['id'])
+        cached = self.service.get_results(selected_sub['id']) if self.service else None
+        if cached:
+            results = cached["results"]
+        else:
+            results = self.azure_ops.analyze_subscription_security(selected_sub['id'])
         if "error" in results:
             self.recommendations_text.insert(tk.END, "❌ Error: ", "section")
             self.recommendations_text.insert(tk.END, f"{results['error']}\n", "normal")
 
+        diff = None
+        if "error" not in results:
+            previous = self.scan_history.get(selected_sub['id'])
+            if previous:
+                diff = diff_scans(previous, results)
+            self.scan_history[selected_sub['id']] = results
+            self.search_index.add_subscription(selected_sub, results)
+        self.current_view = (selected_name, selected_sub, results, diff)
+        self.show_current_view()
+        if cached:
+            scanned_at = datetime.datetime.fromtimestamp(cached["scanned_at"]).strftime("%Y-%m-%d %H:%M")
+            self.status_label.config(text=f"Status: Cached analysis from {scanned_at}")
+        else:
+            self.status_label.config(text="Status: Analysis complete")
+
+    def show_current_view(self):
+        """Show the last analyzed subscription, or an empty panel if there is none"""
+        self.showing_search = False
+        if not self.current_view:
+            self.recommendations_text.config(state='normal')
+            self.recommendations_text.delete(1.0, tk.END)
+            self.recommendations_text.config(state='disabled')
+            return
+
+        selected_name, selected_sub, results, diff = self.current_view
         self.format_results_text(selected_name, selected_sub, results)
-        self.status_label.config(text="Status: Analysis complete")
+        if diff:
+            self.format_diff_text(diff)
+
+    def index_all_subscriptions(self):
+        """Scan every subscription in the background and add it to the search index"""
+        subscriptions = list(self.subscriptions)
+        if not subscriptions:
+            self.status_label.config(text="Status: No subscriptions to index")
+            return
+
+        self.index_button.config(state='disabled')
+
+        def worker():
+            try:
+                for position, sub in enumerate(subscriptions, start=1):
+                    entry = self.service.get_results(sub['id']) if self.service else None
+                    results = entry["results"] if entry else self.azure_ops.analyze_subscription_security(sub['id'])
+                    # Tk is not thread-safe, hand results over to the main loop
+                    self.root.after(0, self.on_subscription_indexed, sub, results, position, len(subscriptions))
+            finally:
+                self.root.after(0, lambda: self.index_button.config(state='normal'))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_subscription_indexed(self, sub, results, position, total):
+        if "error" not in results:
+            self.search_index.add_subscription(sub, results)
+        self.status_label.config(text=f"Status: Indexed {position} of {total} subscriptions")
+        if self.search_entry.get().strip():
+            self.search()
+
+    def search(self):
+        """Show search index matches for the search box in the results panel"""
+        query = self.search_entry.get()
+        if not query.strip():
+            if self.showing_search:
+                self.show_current_view()
+            return
+
+        matches, total = self.search_index.search(query)
+        self.showing_search = True
+        self.configure_text_tags()
+        self.recommendations_text.config(state='normal')
+        self.recommendations_text.delete(1.0, tk.END)
+        self.recommendations_text.insert(tk.END, "🔎 Search Results\n", "section")
+        if len(matches) < total:
+            summary = f"Showing {len(matches)} of {total} matches across {len(self.search_index)} indexed subscriptions, refine the search to see the rest.\n"
+        else:
+            summary = f"{total} matches across {len(self.search_index)} indexed subscriptions.\n"
+        self.recommendations_text.insert(tk.END, summary, "info")
+
+        current_subscription = None
+        for match in matches:
+            if match["subscriptionId"] != current_subscription:
+                current_subscription = match["subscriptionId"]
+                self.recommendations_text.insert(tk.END,
+                    f"  {match['subscriptionName']} ({current_subscription})\n", "subsection")
+            self.recommendations_text.insert(tk.END, f"    • {match['kind']}: {match['text']}\n", "normal")
+
+        self.recommendations_text.config(state='disabled')
+
+    def format_diff_text(self, diff):
+        """Append posture changes against the previous scan of the subscription"""
+        self.recommendations_text.config(state='normal')
+        display_name = "Changes Since Last Scan"
+        self.recommendations_text.insert(tk.END, f"\n{self.icons[display_name]} {display_name}\n", "section")
+        self.recommendations_text.insert(tk.END,
+            "Differences between this analysis and the previous one in this session.\n", "info")
+
+        lines = format_diff(diff)
+        if lines:
+            for line in lines:
+                self.recommendations_text.insert(tk.END, f"    {line}\n", "normal")
+        else:
+            self.recommendations_text.insert(tk.END, "    No posture changes\n", "normal")
+
+        self.recommendations_text.config(state='disabled')
 
     def format_results_text(self, selected_name, selected_sub, results):
         # Enable widget for text insertion
@@ -412,7 +574,8 @@ class SecurityAnalyzerGUI:
                             f"  {severity.upper()} PRIORITY FINDINGS\n", "subsection")
                         recs = self.group_recommendations(recommendations.get(f"{severity}_priority", []))
                         for rec in recs:
-                            self.recommendations_text.insert(tk.END, f"    {icon} {rec}\n", "normal")
+                            self.recommendations_text.insert(tk.END, f"    {icon} ", "normal")
+                            self.insert_recommendation_link(selected_sub, rec)
                 
                 # Add newline at the end of section
                 self.recommendations_text.insert(tk.END, "\n", "normal")
@@ -429,7 +592,7 @@ class SecurityAnalyzerGUI:
                         principal = f"{assignment['principalName']} ({assignment['principalType']})"
                         if role not in privileged_by_role:
                             privileged_by_role[role] = []
-                        privileged_by_role[role].append(principal)
+                        privileged_by_role[role].append((principal, assignment.get('effectiveMembers')))
 
                     # Display privileged roles
                     if privileged_by_role:
@@ -437,8 +600,15 @@ class SecurityAnalyzerGUI:
                         for role, principals in sorted(privileged_by_role.items()):
                             self.recommendations_text.insert(tk.END, 
                                 f"    Role: {role} ({len(principals)} assignments):\n", "normal")
-                            for principal in sorted(principals):
+                            for principal, members in sorted(principals, key=lambda p: p[0]):
                                 self.recommendations_text.insert(tk.END, f"      • {principal}\n", "normal")
+                                # Effective members of privileged groups, when group expansion is enabled
+                                if members is not None:
+                                    self.recommendations_text.insert(tk.END,
+                                        f"          {len(members)} effective members:\n", "info")
+                                    for member in members:
+                                        self.recommendations_text.insert(tk.END,
+                                            f"          ↳ {member['displayName']} ({member['type']})\n", "normal")
                         self.recommendations_text.insert(tk.END, "\n", "normal")
 
                     # Group users by role for standard roles
@@ -465,6 +635,67 @@ class SecurityAnalyzerGUI:
         # Disable widget after text insertion
         self.recommendations_text.config(state='disabled')
 
+    def insert_recommendation_link(self, selected_sub, rec):
+        """Insert a recommendation that opens its affected resources when clicked"""
+        tag = f"rec_{self.recommendations_text.index(tk.END).replace('.', '_')}"
+        name = recommendation_name(rec)
+        self.recommendations_text.insert(tk.END, f"{rec}\n", ("normal", "link", tag))
+        self.recommendations_text.tag_bind(
+            tag, "<Button-1>",
+            lambda event: self.show_affected_resources(selected_sub, name))
+        self.recommendations_text.tag_configure("link", underline=True)
+        self.recommendations_text.tag_bind("link", "<Enter>",
+            lambda event: self.recommendations_text.config(cursor="hand2"))
+        self.recommendations_text.tag_bind("link", "<Leave>",
+            lambda event: self.recommendations_text.config(cursor=""))
+
+    def show_affected_resources(self, selected_sub, recommendation, page_size=50):
+        """Show the resources affected by a recommendation, one page at a time"""
+        window = tk.Toplevel(self.root)
+        window.title(recommendation)
+        window.geometry("900x400")
+        window.configure(bg=self.colors['surface'])
+
+        header = ttk.Label(
+            window,
+            text=recommendation,
+            font=('Segoe UI', 11, 'bold'),
+            foreground=self.colors['primary'],
+            background=self.colors['surface'],
+            wraplength=860
+        )
+        header.pack(anchor="w", padx=15, pady=(15, 5))
+
+        count_label = ttk.Label(
+            window,
+            text="Loading affected resources...",
+            font=('Segoe UI', 10),
+            foreground=self.colors['text_dim'],
+            background=self.colors['surface']
+        )
+        count_label.pack(anchor="w", padx=15, pady=(0, 10))
+
+        resource_list = tk.Listbox(window, font=('Segoe UI', 9), relief='flat')
+        resource_list.pack(fill="both", expand=True, padx=15)
+
+        more_button = ttk.Button(window, text="Load More", style='Modern.TButton')
+        more_button.pack(pady=10)
+
+        def load_page():
+            page = self.azure_ops.get_affected_resources(
+                selected_sub['id'], recommendation, offset=resource_list.size(), limit=page_size)
+            if page["status"] == "Failed":
+                count_label.config(text=f"Error: {page['error']}")
+                return
+            for resource_id in page["resources"]:
+                resource_list.insert(tk.END, resource_id)
+            count_label.config(text=f"Showing {resource_list.size()} of {page['total']} affected resources")
+            if not page["resources"] or resource_list.size() >= page["total"]:
+                more_button.config(state='disabled')
+
+        more_button.config(command=load_page)
+        load_page()
+
     def group_recommendations(self, recs):
         """Helper function to group recommendations and count occurrences"""
         rec_map = {}
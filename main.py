@@ -1,32 +1,203 @@
 from auth import AzureAuthenticator
-from gui import SecurityAnalyzerGUI
+import argparse
+import json
 import os
+import sys
 from dotenv import load_dotenv
-import tkinter as tk
 
-def main():
-    # Load environment variables
-    load_dotenv()
-    
-    # Initialize authentication
-    authenticator = AzureAuthenticator(
+def create_authenticator():
+    return AzureAuthenticator(
         tenant_id=os.getenv("AZURE_TENANT_ID"),
         client_id=os.getenv("AZURE_CLIENT_ID"),
         client_secret=os.getenv("AZURE_CLIENT_SECRET")
     )
-    
+
+def run_gui(args):
+    from gui import SecurityAnalyzerGUI
+    import tkinter as tk
+
+    # Initialize authentication
+    authenticator = create_authenticator()
+
     # Test authentication
     headers = authenticator.get_headers()
     if not headers:
         print("Failed to get authentication headers")
-        return
-        
+        return 1
+
     print("Authentication headers obtained successfully")
-    
+
     # Initialize GUI with authenticator
     root = tk.Tk()
-    app = SecurityAnalyzerGUI(root, authenticator)
+    service_url = args.service_url or os.getenv("SCANNER_SERVICE_URL")
+    app = SecurityAnalyzerGUI(root, authenticator, service_url=service_url)
     root.mainloop()
+    return 0
+
+def run_scan(args):
+    """Scan subscriptions headless and write results keyed by subscription id"""
+    from subscription_analyzer import AzureOperations
+
+    azure_ops = AzureOperations(create_authenticator(), expand_groups=args.expand_groups)
+    subscription_ids = args.subscription or [sub['id'] for sub in azure_ops.get_subscriptions()]
+    if not subscription_ids:
+        print("No subscriptions found")
+        return 1
+
+    results = {}
+    for subscription_id in subscription_ids:
+        print(f"Scanning subscription {subscription_id}")
+        results[subscription_id] = azure_ops.analyze_subscription_security(subscription_id)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Results written to {args.output}")
+    return 0
+
+def run_diff(args):
+    """Print posture changes between two scan files"""
+    from scan_diff import diff_tenant_scans, format_diff, has_changes
+
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    diff = diff_tenant_scans(old, new)
+    if args.json:
+        print(json.dumps(diff, indent=2))
+        return 0
+
+    for sub_id in diff["subscriptions_added"]:
+        print(f"+ Subscription added: {sub_id}")
+    for sub_id in diff["subscriptions_removed"]:
+        print(f"- Subscription removed: {sub_id}")
+    for sub_id in diff["subscriptions_failed"]:
+        print(f"? Subscription not compared, analysis failed in one of the scans: {sub_id}")
+    for sub_id, sub_diff in diff["subscriptions"].items():
+        lines = format_diff(sub_diff)
+        if lines:
+            print(f"Subscription {sub_id}:")
+            for line in lines:
+                print(f"  {line}")
+
+    changed = diff["subscriptions_added"] or diff["subscriptions_removed"] or \
+              any(has_changes(d) for d in diff["subscriptions"].values())
+    if not changed and not diff["subscriptions_failed"]:
+        print("No posture changes")
+    return 0
+
+def run_sweep(args):
+    """Scan all subscriptions of one or more tenants in checkpointed shards"""
+    import sweep
+
+    retryable = []
+    if not args.merge_only:
+        tenants = sweep.load_tenants(args.tenants)
+        try:
+            outcomes = sweep.run_sweep(tenants, args.checkpoint_dir,
+                                       workers=args.workers,
+                                       shard_size=args.shard_size,
+                                       node_index=args.node_index,
+                                       node_count=args.node_count,
+                                       max_attempts=args.max_attempts,
+                                       expand_groups=args.expand_groups)
+        except RuntimeError as e:
+            print(f"Failed to plan shards: {str(e)}")
+            return 1
+        # Shards with checks still failing after the last attempt are kept as they are
+        retryable = [o for o in outcomes if o["status"] == "Failed" or
+                     (o["status"] == "Partial" and o["attempts"] < args.max_attempts)]
+        exhausted = [o for o in outcomes if o["status"] == "Partial" and o["attempts"] >= args.max_attempts]
+        if retryable:
+            print(f"{len(retryable)} shards have failures, rerun the same command to retry them")
+        if exhausted:
+            print(f"{len(exhausted)} shards kept with failed checks after {args.max_attempts} attempts")
+
+    if args.output:
+        results = sweep.merge_shards(args.checkpoint_dir)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Merged results of {len(results)} subscriptions written to {args.output}")
+    return 1 if retryable else 0
+
+def run_serve(args):
+    """Rescan subscriptions on a schedule and serve cached results over HTTP"""
+    from scanner_service import ScannerService, serve
+
+    service = ScannerService(create_authenticator(),
+                             expand_groups=args.expand_groups,
+                             interval=args.interval,
+                             jitter=args.jitter,
+                             max_workers=args.workers,
+                             snapshot_path=args.snapshot)
+    serve(service, host=args.host, port=args.port)
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Azure Subscription Security Inspector")
+    parser.add_argument("--service-url", help="Read cached results from a running scanner service in the GUI")
+    commands = parser.add_subparsers(dest="command")
+
+    scan_parser = commands.add_parser("scan", help="Scan subscriptions without the GUI")
+    scan_parser.add_argument("--subscription", action="append",
+                             help="Subscription id to scan (repeatable, default: all)")
+    scan_parser.add_argument("--output", required=True, help="JSON file to write results to")
+    scan_parser.add_argument("--expand-groups", action="store_true",
+                             help="List effective members of groups holding privileged roles")
+    scan_parser.set_defaults(handler=run_scan)
+
+    diff_parser = commands.add_parser("diff", help="Show posture changes between two scan files")
+    diff_parser.add_argument("old", help="Earlier scan JSON file")
+    diff_parser.add_argument("new", help="Later scan JSON file")
+    diff_parser.add_argument("--json", action="store_true", help="Print the raw diff as JSON")
+    diff_parser.set_defaults(handler=run_diff)
+
+    sweep_parser = commands.add_parser("sweep", help="Scan many subscriptions in parallel shards")
+    sweep_parser.add_argument("--checkpoint-dir", required=True,
+                              help="Directory holding the shard plan and completed shards")
+    sweep_parser.add_argument("--tenants", help="JSON list of tenant_id/client_id/client_secret (default: .env)")
+    sweep_parser.add_argument("--workers", type=int, default=4, help="Worker processes on this node")
+    sweep_parser.add_argument("--shard-size", type=int, default=10, help="Subscriptions per shard")
+    sweep_parser.add_argument("--node-index", type=int, default=0, help="Index of this host in a multi-node sweep")
+    sweep_parser.add_argument("--node-count", type=int, default=1, help="Number of hosts in a multi-node sweep")
+    sweep_parser.add_argument("--max-attempts", type=int, default=3,
+                              help="Scans of a shard before failed checks are kept as they are")
+    sweep_parser.add_argument("--expand-groups", action="store_true",
+                              help="List effective members of groups holding privileged roles")
+    sweep_parser.add_argument("--merge-only", action="store_true", help="Only merge completed shards")
+    sweep_parser.add_argument("--output", help="JSON file to write merged results to")
+    sweep_parser.set_defaults(handler=run_sweep)
+
+    serve_parser = commands.add_parser("serve", help="Run the scheduled scanner service")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to serve the JSON API on")
+    serve_parser.add_argument("--port", type=int, default=8080, help="Port to serve the JSON API on")
+    serve_parser.add_argument("--interval", type=float, default=3600, help="Seconds between rescans of a subscription")
+    serve_parser.add_argument("--jitter", type=float, default=0.1, help="Random delay added to rescans, as a fraction of the interval")
+    serve_parser.add_argument("--workers", type=int, default=4, help="Subscriptions scanned at the same time")
+    serve_parser.add_argument("--snapshot", help="JSON file to persist cached results across restarts")
+    serve_parser.add_argument("--expand-groups", action="store_true",
+                              help="List effective members of groups holding privileged roles")
+    serve_parser.set_defaults(handler=run_serve)
+
+    args = parser.parse_args()
+    if args.command == "sweep":
+        if args.shard_size < 1:
+            sweep_parser.error("--shard-size must be at least 1")
+        if args.workers < 1:
+            sweep_parser.error("--workers must be at least 1")
+        if args.max_attempts < 1:
+            sweep_parser.error("--max-attempts must be at least 1")
+        if args.node_count < 1:
+            sweep_parser.error("--node-count must be at least 1")
+        if not 0 <= args.node_index < args.node_count:
+            sweep_parser.error("--node-index must be between 0 and --node-count - 1")
+
+    # Load environment variables
+    load_dotenv()
+
+    handler = getattr(args, "handler", run_gui)
+    return handler(args)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
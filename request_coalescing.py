@@ -0,0 +1,69 @@
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+import requests
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers asking for the same key
+
+    Nothing is cached: once the call finishes, the next caller with the same key
+    starts a new one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+# Shared by every AzureOperations and AzureAuthenticator in the process
+flight = SingleFlight()
+
+
+def coalesced_get(url: str, headers: Optional[Dict[str, str]] = None,
+                  scope: Optional[str] = None, **kwargs) -> requests.Response:
+    """requests.get that shares the response of identical concurrent GETs
+
+    Requests are keyed by URL and scope. The scope should name the identity and
+    token audience of the caller (see AzureAuthenticator.request_scope) so callers
+    with different permissions never share a response; it defaults to the
+    Authorization header. Requests without an Authorization header, e.g. after a
+    failed token request, are sent on their own so their 401 is never handed to
+    callers that have a token. Callers must treat the returned response as read-only.
+    """
+    authorization = (headers or {}).get("Authorization")
+    if not authorization:
+        return requests.get(url, headers=headers, **kwargs)
+    if scope is None:
+        scope = authorization
+    return flight.do(("GET", url, scope), lambda: requests.get(url, headers=headers, **kwargs))
@@ -0,0 +1,167 @@
+import re
+from typing import Dict, List, Tuple
+
+# Severity buckets produced by AzureOperations._check_security_center
+SEVERITIES = ("high", "medium", "low")
+
+_RESOURCE_COUNT_SUFFIX = re.compile(r'\s*\(\d+ resources\)\s*$')
+
+
+def recommendation_name(text: str) -> str:
+    """Strip the "(N resources)" suffix from a formatted recommendation"""
+    return _RESOURCE_COUNT_SUFFIX.sub('', text.strip())
+
+
+def _completed(results: Dict, section: str) -> bool:
+    check = results.get(section) or {}
+    return check.get("status") == "Completed"
+
+
+def _privileged(results: Dict) -> List[Dict]:
+    return results["RBAC Settings"].get("details", {}).get("privileged", [])
+
+
+def _privileged_keys(assignments: List[Dict], use_ids: bool, use_scopes: bool) -> Dict[Tuple[str, str, str], Dict]:
+    """Key privileged assignments by (role, principal, scope) for set operations
+
+    Principal ids are used when available, since display names get renamed and
+    fall back to the raw id when the Graph lookup fails. The scope keeps the same
+    role held by one principal at several scopes as separate assignments.
+    """
+    return {
+        (
+            a['role'],
+            a['principalId'] if use_ids else a['principalName'],
+            a['scope'].lower() if use_scopes else ''
+        ): a
+        for a in assignments
+    }
+
+
+def _defender_tiers(results: Dict) -> Dict[str, str]:
+    return {
+        service['name']: service['tier']
+        for service in results["Microsoft Defender"].get("details", [])
+    }
+
+
+def _recommendation_keys(results: Dict) -> Dict[str, set]:
+    recommendations = results["Security Center"].get("recommendations", {})
+    return {
+        severity: {recommendation_name(rec) for rec in recommendations.get(f"{severity}_priority", [])}
+        for severity in SEVERITIES
+    }
+
+
+def diff_scans(old: Dict[str, any], new: Dict[str, any]) -> Dict[str, any]:
+    """Compare two results of AzureOperations.analyze_subscription_security
+
+    Sections that failed in either scan are listed under "skipped" instead of
+    being reported as changes.
+    """
+    diff = {
+        "privileged_added": [],
+        "privileged_removed": [],
+        "defender_downgraded": [],
+        "defender_upgraded": [],
+        "recommendations_new": {severity: [] for severity in SEVERITIES},
+        "recommendations_resolved": {severity: [] for severity in SEVERITIES},
+        "skipped": []
+    }
+
+    if _completed(old, "RBAC Settings") and _completed(new, "RBAC Settings"):
+        old_assignments, new_assignments = _privileged(old), _privileged(new)
+        # Scans saved before principal ids were recorded can only be matched by name
+        use_ids = all('principalId' in a for a in old_assignments + new_assignments)
+        use_scopes = all('scope' in a for a in old_assignments + new_assignments)
+        old_privileged = _privileged_keys(old_assignments, use_ids, use_scopes)
+        new_privileged = _privileged_keys(new_assignments, use_ids, use_scopes)
+        diff["privileged_added"] = [new_privileged[k] for k in sorted(new_privileged.keys() - old_privileged.keys())]
+        diff["privileged_removed"] = [old_privileged[k] for k in sorted(old_privileged.keys() - new_privileged.keys())]
+    else:
+        diff["skipped"].append("RBAC Settings")
+
+    if _completed(old, "Microsoft Defender") and _completed(new, "Microsoft Defender"):
+        old_tiers = _defender_tiers(old)
+        new_tiers = _defender_tiers(new)
+        for name in sorted(old_tiers.keys() & new_tiers.keys()):
+            old_tier, new_tier = old_tiers[name], new_tiers[name]
+            if old_tier == new_tier:
+                continue
+            change = {"name": name, "old_tier": old_tier, "new_tier": new_tier}
+            if old_tier == "Standard":
+                diff["defender_downgraded"].append(change)
+            elif new_tier == "Standard":
+                diff["defender_upgraded"].append(change)
+    else:
+        diff["skipped"].append("Microsoft Defender")
+
+    if _completed(old, "Security Center") and _completed(new, "Security Center"):
+        old_recs = _recommendation_keys(old)
+        new_recs = _recommendation_keys(new)
+        for severity in SEVERITIES:
+            diff["recommendations_new"][severity] = sorted(new_recs[severity] - old_recs[severity])
+            diff["recommendations_resolved"][severity] = sorted(old_recs[severity] - new_recs[severity])
+    else:
+        diff["skipped"].append("Security Center")
+
+    return diff
+
+
+def has_changes(diff: Dict[str, any]) -> bool:
+    """Return True if a diff_scans result contains any posture change"""
+    return any([
+        diff["privileged_added"],
+        diff["privileged_removed"],
+        diff["defender_downgraded"],
+        diff["defender_upgraded"],
+        any(diff["recommendations_new"].values()),
+        any(diff["recommendations_resolved"].values())
+    ])
+
+
+def diff_tenant_scans(old: Dict[str, Dict], new: Dict[str, Dict]) -> Dict[str, any]:
+    """Compare two scans keyed by subscription id
+
+    Subscriptions whose analysis failed in either scan are listed under
+    "subscriptions_failed" instead of being compared.
+    """
+    common = sorted(old.keys() & new.keys())
+    failed = [sub_id for sub_id in common if "error" in old[sub_id] or "error" in new[sub_id]]
+    return {
+        "subscriptions_added": sorted(new.keys() - old.keys()),
+        "subscriptions_removed": sorted(old.keys() - new.keys()),
+        "subscriptions_failed": failed,
+        "subscriptions": {
+            sub_id: diff_scans(old[sub_id], new[sub_id])
+            for sub_id in common
+            if sub_id not in failed
+        }
+    }
+
+
+def format_diff(diff: Dict[str, any]) -> List[str]:
+    """Render a diff_scans result as human readable lines"""
+    def assignment_text(assignment: Dict) -> str:
+        text = f"{assignment['role']} -> {assignment['principalName']} ({assignment['principalType']})"
+        if assignment.get('scope'):
+            text += f" at {assignment['scope']}"
+        return text
+
+    lines = []
+    for assignment in diff["privileged_added"]:
+        lines.append(f"+ Privileged: {assignment_text(assignment)}")
+    for assignment in diff["privileged_removed"]:
+        lines.append(f"- Privileged: {assignment_text(assignment)}")
+    for change in diff["defender_downgraded"]:
+        lines.append(f"- Defender downgraded: {change['name']} ({change['old_tier']} -> {change['new_tier']})")
+    for change in diff["defender_upgraded"]:
+        lines.append(f"+ Defender upgraded: {change['name']} ({change['old_tier']} -> {change['new_tier']})")
+    for severity in SEVERITIES:
+        for rec in diff["recommendations_new"][severity]:
+            lines.append(f"+ New {severity} recommendation: {rec}")
+        for rec in diff["recommendations_resolved"][severity]:
+            lines.append(f"- Resolved {severity} recommendation: {rec}")
+    for section in diff["skipped"]:
+        lines.append(f"? Skipped {section}: check failed in one of the scans")
+    return lines
@@ -0,0 +1,303 @@
+import heapq
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import requests
+
+from subscription_analyzer import AzureOperations
+
+
+class ScannerService:
+    """Rescan subscriptions on a schedule and keep the latest results in memory"""
+
+    def __init__(self, authenticator, interval: float = 3600, jitter: float = 0.1,
+                 max_workers: int = 4, snapshot_path: Optional[str] = None,
+                 snapshot_interval: float = 60, expand_groups: bool = False):
+        self.azure_ops = AzureOperations(authenticator, expand_groups=expand_groups)
+        self.interval = interval
+        self.jitter = jitter
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[str, Dict] = {}
+        self._results: Dict[str, Dict] = {}
+        self._schedule: List = []  # Heap of (due time, subscription id), may hold stale entries
+        self._due: Dict[str, float] = {}  # The one current due time per subscription
+        self._scanning = set()
+        self._queued: Dict[str, tuple] = {}  # Submitted scans not started yet: (future, due time)
+        self._restored_due: Dict[str, float] = {}  # Due times loaded from the snapshot
+        self._dirty = False
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._thread = None
+
+    def start(self) -> None:
+        self.load_snapshot()
+        self._thread = threading.Thread(target=self._run, name="scanner-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+        # Drop scans still waiting for a worker, they keep their due time for the snapshot
+        with self._lock:
+            for sub_id, (future, due) in list(self._queued.items()):
+                if future.cancel():
+                    del self._queued[sub_id]
+                    self._scanning.discard(sub_id)
+                    self._due[sub_id] = due
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._dirty = True
+        self.save_snapshot()
+
+    def _jittered(self, delay: float) -> float:
+        return delay + random.uniform(0, self.jitter * self.interval)
+
+    def _schedule_at(self, subscription_id: str, due: float) -> None:
+        # Replaces any earlier due time, the old heap entry is skipped when popped
+        self._due[subscription_id] = due
+        heapq.heappush(self._schedule, (due, subscription_id))
+
+    def refresh_subscriptions(self) -> None:
+        """Pick up added/removed subscriptions and stagger first scans across the interval"""
+        subscriptions = self.azure_ops.get_subscriptions()
+        if not subscriptions:
+            return
+
+        now = time.time()
+        with self._lock:
+            known = set(self._subscriptions)
+            self._subscriptions = {sub['id']: sub for sub in subscriptions}
+            for sub_id in set(self._results) - set(self._subscriptions):
+                self._results.pop(sub_id)
+                self._dirty = True
+            for sub_id in set(self._due) - set(self._subscriptions):
+                del self._due[sub_id]
+
+            new_ids = sorted(set(self._subscriptions) - known)
+            slot = self.interval / max(len(new_ids), 1)
+            for index, sub_id in enumerate(new_ids):
+                # Subscriptions restored from a snapshot are due one interval after their last scan
+                scanned_at = self._results.get(sub_id, {}).get("scanned_at")
+                if sub_id in self._restored_due:
+                    self._schedule_at(sub_id, self._restored_due.pop(sub_id))
+                    continue
+                due = now + index * slot
+                if scanned_at:
+                    due = max(due, scanned_at + self.interval)
+                self._schedule_at(sub_id, self._jittered(due - now) + now)
+        self._wakeup.set()
+
+    def request_refresh(self, subscription_id: str) -> bool:
+        """Scan a subscription as soon as a worker is free"""
+        with self._lock:
+            if subscription_id not in self._subscriptions:
+                return False
+            now = time.time()
+            if self._due.get(subscription_id, now + 1) > now:
+                self._schedule_at(subscription_id, now)
+        self._wakeup.set()
+        return True
+
+    def _run(self) -> None:
+        next_refresh = 0
+        next_snapshot = time.time() + self.snapshot_interval
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            now = time.time()
+            if now >= next_refresh:
+                self.refresh_subscriptions()
+                next_refresh = now + self.interval
+            if now >= next_snapshot:
+                self.save_snapshot()
+                next_snapshot = now + self.snapshot_interval
+
+            with self._lock:
+                while self._schedule and self._schedule[0][0] <= now:
+                    due, sub_id = heapq.heappop(self._schedule)
+                    # Skip entries replaced by a newer due time, and leave a due time
+                    # reached during a running scan for that scan to pick up
+                    if self._due.get(sub_id) != due or sub_id in self._scanning:
+                        continue
+                    del self._due[sub_id]
+                    self._scanning.add(sub_id)
+                    self._queued[sub_id] = (self._executor.submit(self._scan, sub_id), due)
+                next_due = self._schedule[0][0] if self._schedule else now + self.interval
+
+            self._wakeup.wait(max(0, min(next_due, next_refresh, next_snapshot) - time.time()))
+
+    def _scan(self, subscription_id: str) -> None:
+        with self._lock:
+            self._queued.pop(subscription_id, None)
+        try:
+            results = self.azure_ops.analyze_subscription_security(subscription_id)
+            with self._lock:
+                if subscription_id in self._subscriptions and "error" not in results:
+                    self._results[subscription_id] = {
+                        "subscription": self._subscriptions[subscription_id],
+                        "scanned_at": time.time(),
+                        "results": results
+                    }
+                    self._dirty = True
+                elif "error" in results:
+                    print(f"Scan of {subscription_id} failed: {results['error']}")
+        except Exception as e:
+            print(f"Scan of {subscription_id} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._scanning.discard(subscription_id)
+                if subscription_id in self._due:
+                    # A refresh was requested while scanning, keep its due time
+                    heapq.heappush(self._schedule, (self._due[subscription_id], subscription_id))
+                elif subscription_id in self._subscriptions:
+                    self._schedule_at(subscription_id, time.time() + self._jittered(self.interval))
+            self._wakeup.set()
+
+    def get_subscriptions(self) -> List[Dict]:
+        with self._lock:
+            return [
+                dict(sub, scanned_at=self._results.get(sub_id, {}).get("scanned_at"))
+                for sub_id, sub in sorted(self._subscriptions.items())
+            ]
+
+    def get_results(self, subscription_id: Optional[str] = None) -> Optional[Dict]:
+        """Latest cached results, for one subscription or all of them"""
+        with self._lock:
+            if subscription_id is None:
+                return dict(self._results)
+            return self._results.get(subscription_id)
+
+    def load_snapshot(self) -> None:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            results = snapshot["results"]
+            with self._lock:
+                self._results = results
+                self._restored_due = snapshot.get("due", {})
+            print(f"Loaded {len(results)} cached subscriptions from {self.snapshot_path}")
+        except Exception as e:
+            print(f"Error loading snapshot: {str(e)}")
+
+    def save_snapshot(self) -> None:
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = {"results": dict(self._results), "due": dict(self._due)}
+            self._dirty = False
+        try:
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            print(f"Error saving snapshot: {str(e)}")
+
+
+class _ServiceRequestHandler(BaseHTTPRequestHandler):
+    service: ScannerService = None
+
+    def _send_json(self, status: int, data) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if parts == ["health"]:
+            self._send_json(200, {"status": "ok", "cached": len(self.service.get_results())})
+        elif parts == ["subscriptions"]:
+            self._send_json(200, self.service.get_subscriptions())
+        elif parts == ["results"]:
+            self._send_json(200, self.service.get_results())
+        elif len(parts) == 2 and parts[0] == "results":
+            entry = self.service.get_results(parts[1])
+            if entry:
+                self._send_json(200, entry)
+            else:
+                self._send_json(404, {"error": "No cached results for subscription"})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if len(parts) == 2 and parts[0] == "refresh":
+            if self.service.request_refresh(parts[1]):
+                self._send_json(202, {"status": "scheduled"})
+            else:
+                self._send_json(404, {"error": "Unknown subscription"})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(service: ScannerService, host: str = "127.0.0.1", port: int = 8080) -> None:
+    """Run the scheduler and serve cached results until interrupted"""
+    handler = type("ServiceRequestHandler", (_ServiceRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    service.start()
+    print(f"Scanner service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+class ScannerServiceClient:
+    """Read cached results from a running scanner service"""
+
+    def __init__(self, base_url: str, timeout: float = 5):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def get_subscriptions(self) -> List[Dict[str, str]]:
+        try:
+            response = requests.get(f"{self.base_url}/subscriptions", timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            print(f"Error fetching subscriptions from scanner service: {str(e)}")
+            return []
+
+    def get_all_results(self) -> Dict[str, Dict]:
+        try:
+            response = requests.get(f"{self.base_url}/results", timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            print(f"Error fetching results from scanner service: {str(e)}")
+            return {}
+
+    def get_results(self, subscription_id: str) -> Optional[Dict]:
+        try:
+            response = requests.get(f"{self.base_url}/results/{subscription_id}", timeout=self.timeout)
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            print(f"Error fetching results from scanner service: {str(e)}")
+            return None
@@ -0,0 +1,127 @@
+import re
+from bisect import bisect_left
+from typing import Dict, List, Set, Tuple
+
+from scan_diff import SEVERITIES, recommendation_name
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(str(text).lower())
+
+
+class SearchIndex:
+    """Inverted index over scan results of many subscriptions
+
+    Every privileged or standard role assignment, recommendation and tag is a
+    document. Documents are found by the words of their principal name/id,
+    role, recommendation text or tag, and the last query word matches as a
+    prefix so the index can back a search-as-you-type box.
+    """
+
+    def __init__(self):
+        self._documents: List[Dict] = []
+        self._free_ids: List[int] = []  # Slots of removed documents, reused by new ones
+        self._postings: Dict[str, Set[int]] = {}
+        self._subscription_documents: Dict[str, List[int]] = {}
+        self._sorted_tokens: List[str] = []
+        self._tokens_dirty = False
+
+    def __len__(self) -> int:
+        return len(self._subscription_documents)
+
+    def _add_document(self, document: Dict, text: str) -> None:
+        if self._free_ids:
+            doc_id = self._free_ids.pop()
+            self._documents[doc_id] = document
+        else:
+            doc_id = len(self._documents)
+            self._documents.append(document)
+        self._subscription_documents[document["subscriptionId"]].append(doc_id)
+        for token in set(tokenize(text)):
+            postings = self._postings.get(token)
+            if postings is None:
+                self._postings[token] = postings = set()
+                self._tokens_dirty = True
+            postings.add(doc_id)
+
+    def remove_subscription(self, subscription_id: str) -> None:
+        for doc_id in self._subscription_documents.pop(subscription_id, []):
+            document = self._documents[doc_id]
+            for token in set(tokenize(document["search_text"])):
+                postings = self._postings[token]
+                postings.discard(doc_id)
+                if not postings:
+                    del self._postings[token]
+                    self._tokens_dirty = True
+            self._documents[doc_id] = None
+            self._free_ids.append(doc_id)
+
+    def add_subscription(self, subscription: Dict, results: Dict) -> None:
+        """Index (or re-index) the results of one subscription"""
+        subscription_id = subscription['id']
+        self.remove_subscription(subscription_id)
+        self._subscription_documents[subscription_id] = []
+
+        def add(kind: str, text: str, search_text: str) -> None:
+            self._add_document({
+                "subscriptionId": subscription_id,
+                "subscriptionName": subscription.get('name', subscription_id),
+                "kind": kind,
+                "text": text,
+                "search_text": search_text
+            }, search_text)
+
+        for key, value in (subscription.get('tags') or {}).items():
+            add("tag", f"{key}: {value}", f"tag {key} {value}")
+
+        rbac = results.get("RBAC Settings") or {}
+        if rbac.get("status") == "Completed":
+            for group in ("privileged", "normal"):
+                for assignment in rbac["details"].get(group, []):
+                    text = f"{assignment['role']}: {assignment['principalName']} ({assignment['principalType']})"
+                    add(group, text,
+                        f"{group} {assignment['role']} {assignment['principalName']} "
+                        f"{assignment.get('principalId', '')} {assignment['principalType']}")
+
+        security_center = results.get("Security Center") or {}
+        if security_center.get("status") == "Completed":
+            recommendations = security_center["recommendations"]
+            for severity in SEVERITIES:
+                for rec in recommendations.get(f"{severity}_priority", []):
+                    add("recommendation", f"[{severity}] {rec}",
+                        f"recommendation {severity} {recommendation_name(rec)}")
+
+    def _matching_tokens(self, prefix: str) -> List[str]:
+        if self._tokens_dirty:
+            self._sorted_tokens = sorted(self._postings)
+            self._tokens_dirty = False
+        start = bisect_left(self._sorted_tokens, prefix)
+        end = bisect_left(self._sorted_tokens, prefix + "\uffff")
+        return self._sorted_tokens[start:end]
+
+    def search(self, query: str, limit: int = 200) -> Tuple[List[Dict], int]:
+        """Documents containing every query word, grouped by subscription
+
+        Returns at most `limit` documents together with the total number of matches.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return [], 0
+
+        candidates = None
+        for position, token in enumerate(tokens):
+            if position == len(tokens) - 1:
+                matches = set()
+                for match in self._matching_tokens(token):
+                    matches |= self._postings[match]
+            else:
+                matches = self._postings.get(token, set())
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                return [], 0
+
+        documents = [self._documents[doc_id] for doc_id in candidates]
+        documents.sort(key=lambda d: (d["subscriptionName"], d["subscriptionId"], d["kind"], d["text"]))
+        return documents[:limit], len(documents)
@@ -1,35 +1,53 @@
-import requests
 from typing import List, Dict, Optional
 
 # Import required classes for Resource Graph queries
 from azure.identity import ClientSecretCredential
 from azure.mgmt.resourcegraph import ResourceGraphClient
-from azure.mgmt.resourcegraph.models import QueryRequest
+from azure.mgmt.resourcegraph.models import QueryRequest, QueryRequestOptions
+
+from findings_index import FindingsIndex
+from group_expansion import GroupExpander
+from request_coalescing import coalesced_get
 
 class AzureOperations:
-    def __init__(self, authenticator):
+    def __init__(self, authenticator, expand_groups: bool = False):
         self.authenticator = authenticator
         self.base_url = "https://management.azure.com"
+        self.findings: Dict[str, FindingsIndex] = {}  # Latest findings index per subscription id
+        # Optionally resolve privileged groups to their effective members, cached across scans
+        self.expand_groups = expand_groups
+        self.group_expander = GroupExpander(authenticator)
         
+    def _get(self, url: str, headers: Dict, scope: Optional[str] = None):
+        """GET shared with identical concurrent requests of other scans"""
+        scope = self.authenticator.request_scope(scope or self.authenticator.scope)
+        return coalesced_get(url, headers=headers, scope=scope)
+
+    def list_subscriptions(self) -> List[Dict[str, str]]:
+        """Fetch all available subscriptions, raising on authentication or HTTP errors"""
+        headers = self.authenticator.get_headers()
+        if not headers:
+            raise RuntimeError("Failed to get authentication headers")
+
+        subscriptions = []
+        url = f"{self.base_url}/subscriptions?api-version=2020-01-01"
+        while url:
+            response = self._get(url, headers)
+            response.raise_for_status()
+            data = response.json()
+            subscriptions.extend(data.get('value', []))
+            url = data.get('nextLink')
+
+        return [{
+            'id': sub['subscriptionId'], 
+            'name': sub['displayName'],
+            'tags': sub.get('tags', {})  # Dodajemy tagi
+        } for sub in subscriptions]
+
     def get_subscriptions(self) -> List[Dict[str, str]]:
         """Fetch all available subscriptions"""
         try:
-            headers = self.authenticator.get_headers()
-            if not headers:
-                print("Failed to get authentication headers")
-                return []
-                
-            url = f"{self.base_url}/subscriptions?api-version=2020-01-01"
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            
-            subscriptions = response.json().get('value', [])
-            return [{
-                'id': sub['subscriptionId'], 
-                'name': sub['displayName'],
-                'tags': sub.get('tags', {})  # Dodajemy tagi
-            } for sub in subscriptions]
-            
+            return self.list_subscriptions()
         except Exception as e:
             print(f"Error fetching subscriptions: {str(e)}")
             return []
@@ -64,7 +82,7 @@ class AzureOperations:
         """Check Microsoft Defender for Cloud settings"""
         try:
             url = f"{self.base_url}/subscriptions/{subscription_id}/providers/Microsoft.Security/pricings?api-version=2023-01-01"
-            response = requests.get(url, headers=headers)
+            response = self._get(url, headers)
             response.raise_for_status()
             
             services = response.json().get('value', [])
@@ -80,17 +98,36 @@ class AzureOperations:
         except Exception as e:
             return {"status": "Failed", "error": str(e)}
 
+    def _resource_graph_client(self) -> ResourceGraphClient:
+        # Build a ClientSecretCredential using SPN details from the authenticator
+        credential = ClientSecretCredential(
+            tenant_id=self.authenticator.tenant_id,
+            client_id=self.authenticator.client_id,
+            client_secret=self.authenticator.client_secret
+        )
+        return ResourceGraphClient(credential)
+
+    def _query_all_pages(self, resource_client: ResourceGraphClient, subscription_id: str, query: str):
+        """Yield every row of a Resource Graph query, following skip tokens past truncated pages"""
+        skip_token = None
+        while True:
+            request = QueryRequest(
+                subscriptions=[subscription_id],
+                query=query,
+                options=QueryRequestOptions(skip_token=skip_token, top=1000)
+            )
+            response = resource_client.resources(request)
+            for row in response.data or []:
+                yield row
+            skip_token = response.skip_token
+            if not skip_token:
+                break
+
     def _check_security_center(self, subscription_id: str) -> Dict[str, any]:
         """Fetch security recommendations via Azure Resource Graph"""
         try:
-            # Build a ClientSecretCredential using SPN details from the authenticator
-            credential = ClientSecretCredential(
-                tenant_id=self.authenticator.tenant_id,
-                client_id=self.authenticator.client_id,
-                client_secret=self.authenticator.client_secret
-            )
             # Create the ResourceGraphClient
-            resource_client = ResourceGraphClient(credential)
+            resource_client = self._resource_graph_client()
             
             # Define a KQL query to fetch assessments for unhealthy resources
             query = """
@@ -98,13 +135,9 @@ class AzureOperations:
             | where type =~ "microsoft.security/assessments" and properties.status.code =~ "Unhealthy"
             | extend severity = tostring(properties.metadata.severity)
             | extend resourceId = tostring(properties.resourceDetails.Id)
+            | order by id asc
             | project displayName = properties.displayName, severity, resourceId
             """
-            request = QueryRequest(
-                subscriptions=[subscription_id],
-                query=query
-            )
-            response = resource_client.resources(request)
             
             # Initialize counters and recommendation groups
             severity_counts = {"high": 0, "medium": 0, "low": 0}
@@ -114,17 +147,24 @@ class AzureOperations:
                 "low": {}     # Dictionary to store low recommendations and their counts
             }
             
-            if response and response.data:
-                for row in response.data:
-                    severity = row.get("severity", "").lower()
-                    name = row.get("displayName", "Unnamed Recommendation")
-                    
-                    if severity in severity_counts:
-                        severity_counts[severity] += 1
-                        if name in recommendations[severity]:
-                            recommendations[severity][name] += 1
-                        else:
-                            recommendations[severity][name] = 1
+            # Keep affected resources for drilldown instead of only counting them
+            findings = FindingsIndex()
+            
+            for row in self._query_all_pages(resource_client, subscription_id, query):
+                severity = row.get("severity", "").lower()
+                name = row.get("displayName", "Unnamed Recommendation")
+                resource_id = row.get("resourceId")
+                
+                if severity in severity_counts:
+                    severity_counts[severity] += 1
+                    if name in recommendations[severity]:
+                        recommendations[severity][name] += 1
+                    else:
+                        recommendations[severity][name] = 1
+                    if resource_id:
+                        findings.add(name, severity, resource_id)
+            
+            self.findings[subscription_id] = findings
             
             # Format recommendations with resource counts
             formatted_recommendations = {
@@ -161,13 +201,13 @@ class AzureOperations:
 
             # Get role assignments
             assignments_url = f"{self.base_url}/subscriptions/{subscription_id}/providers/Microsoft.Authorization/roleAssignments?api-version=2022-04-01"
-            assignments_response = requests.get(assignments_url, headers=headers)
+            assignments_response = self._get(assignments_url, headers)
             assignments_response.raise_for_status()
             assignments = assignments_response.json().get('value', [])
 
             # Get role definitions
             roles_url = f"{self.base_url}/subscriptions/{subscription_id}/providers/Microsoft.Authorization/roleDefinitions?api-version=2022-04-01"
-            roles_response = requests.get(roles_url, headers=headers)
+            roles_response = self._get(roles_url, headers)
             roles_response.raise_for_status()
             roles = {role['name']: role['properties']['roleName'] 
                     for role in roles_response.json().get('value', [])}
@@ -186,7 +226,7 @@ class AzureOperations:
                 
                 # Try to get principal details from Microsoft Graph
                 principal_url = f"{graph_url}/directoryObjects/{principal_id}"
-                principal_response = requests.get(principal_url, headers=graph_headers)
+                principal_response = self._get(principal_url, graph_headers, self.authenticator.graph_scope)
                 
                 if principal_response.status_code == 200:
                     principal_data = principal_response.json()
@@ -197,12 +237,20 @@ class AzureOperations:
                     principal_type = "Unknown"
 
                 assignment_info = {
+                    'id': assignment['id'],
+                    'scope': assignment['properties'].get('scope', ''),
                     'role': role_name,
+                    'principalId': principal_id,
                     'principalName': principal_name,
                     'principalType': principal_type
                 }
 
                 if role_name in privileged_roles:
+                    if self.expand_groups and principal_type == 'group':
+                        try:
+                            assignment_info['effectiveMembers'] = self.group_expander.expand(principal_id, graph_headers)
+                        except Exception as e:
+                            print(f"Error expanding group {principal_name}: {str(e)}")
                     privileged_assignments.append(assignment_info)
                 else:
                     normal_assignments.append(assignment_info)
@@ -217,3 +265,42 @@ class AzureOperations:
             }
         except Exception as e:
             return {"status": "Failed", "error": str(e)}
+
+    def get_affected_resources(self, subscription_id: str, recommendation: str,
+                               offset: int = 0, limit: int = 50) -> Dict[str, any]:
+        """Page through the resources affected by a recommendation
+
+        Served from the findings index of the last scan, or queried from Resource
+        Graph one page at a time when the subscription was not scanned here.
+        """
+        findings = self.findings.get(subscription_id)
+        if findings is not None and recommendation in findings:
+            return {
+                "status": "Completed",
+                "total": findings.resource_count(recommendation),
+                "resources": findings.resources_for(recommendation, offset, limit)
+            }
+
+        try:
+            resource_client = self._resource_graph_client()
+            display_name = recommendation.replace('\\', '\\\\').replace('"', '\\"')
+            query = f"""
+            securityresources
+            | where type =~ "microsoft.security/assessments" and properties.status.code =~ "Unhealthy"
+            | where tostring(properties.displayName) == "{display_name}"
+            | project resourceId = tostring(properties.resourceDetails.Id)
+            | order by resourceId asc
+            """
+            request = QueryRequest(
+                subscriptions=[subscription_id],
+                query=query,
+                options=QueryRequestOptions(skip=offset, top=limit)
+            )
+            response = resource_client.resources(request)
+            return {
+                "status": "Completed",
+                "total": response.total_records,
+                "resources": [row.get("resourceId") for row in response.data or []]
+            }
+        except Exception as e:
+            return {"status": "Failed", "error": str(e)}
@@ -0,0 +1,266 @@
+import json
+import os
+import socket
+import zlib
+from multiprocessing import Pool
+from typing import Dict, List, Optional
+
+from auth import AzureAuthenticator
+from subscription_analyzer import AzureOperations
+
+MANIFEST_FILE = "manifest.json"
+
+# Credentials of every tenant in the sweep, set per worker process by _init_worker
+_worker_tenants: Dict[str, Dict[str, str]] = {}
+
+
+def _write_json(path: str, data) -> None:
+    """Write JSON atomically so an interrupted sweep never leaves half a shard"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _shard_path(checkpoint_dir: str, shard_id: str) -> str:
+    return os.path.join(checkpoint_dir, f"shard-{shard_id}.json")
+
+
+def _authenticator(tenant: Dict[str, str]) -> AzureAuthenticator:
+    return AzureAuthenticator(
+        tenant_id=tenant["tenant_id"],
+        client_id=tenant["client_id"],
+        client_secret=tenant["client_secret"]
+    )
+
+
+def load_tenants(path: Optional[str] = None) -> List[Dict[str, str]]:
+    """Load tenant credentials from a JSON list, or the AZURE_* environment variables"""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return [{
+        "tenant_id": os.getenv("AZURE_TENANT_ID"),
+        "client_id": os.getenv("AZURE_CLIENT_ID"),
+        "client_secret": os.getenv("AZURE_CLIENT_SECRET")
+    }]
+
+
+def plan_shards(tenants: List[Dict[str, str]], shard_size: int) -> List[Dict[str, any]]:
+    """Split the subscriptions of every tenant into fixed-size shards
+
+    Subscriptions are sorted by id so the same tenants always produce the same plan.
+    Credentials are not part of the plan, it only names the tenant of each shard.
+    A failed listing raises, so a transient error never produces a plan that
+    silently skips the tenant, while a tenant without subscriptions gets no shards.
+    """
+    shards = []
+    for tenant in sorted(tenants, key=lambda t: t["tenant_id"]):
+        azure_ops = AzureOperations(_authenticator(tenant))
+        try:
+            subscription_ids = sorted(sub['id'] for sub in azure_ops.list_subscriptions())
+        except Exception as e:
+            raise RuntimeError(f"Failed to list subscriptions for tenant {tenant['tenant_id']}: {str(e)}") from e
+        for index in range(0, len(subscription_ids), shard_size):
+            shards.append({
+                "shard_id": f"{tenant['tenant_id']}-{index // shard_size:04d}",
+                "tenant_id": tenant["tenant_id"],
+                "subscriptions": subscription_ids[index:index + shard_size]
+            })
+    return shards
+
+
+def _read_manifest(manifest_path: str, tenant_ids: List[str], shard_size: int) -> List[Dict[str, any]]:
+    """Load a shard plan, refusing one made for other tenants or another shard size"""
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("tenant_ids") != tenant_ids or manifest.get("shard_size") != shard_size:
+        raise RuntimeError(
+            f"{manifest_path} was planned for tenants {manifest.get('tenant_ids')} with shard size "
+            f"{manifest.get('shard_size')}, not {tenant_ids} with shard size {shard_size}. "
+            "Use a fresh checkpoint directory for a new sweep")
+    return manifest["shards"]
+
+
+def load_or_plan(checkpoint_dir: str, tenants: List[Dict[str, str]], shard_size: int) -> List[Dict[str, any]]:
+    """Reuse the shard plan of an interrupted sweep, or create a new one
+
+    The manifest is published with a hard link, which fails if it already
+    exists. When several hosts plan against the same empty checkpoint directory,
+    exactly one plan wins and every host continues with that plan.
+    """
+    tenant_ids = sorted(tenant["tenant_id"] for tenant in tenants)
+    manifest_path = os.path.join(checkpoint_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        return _read_manifest(manifest_path, tenant_ids, shard_size)
+
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    shards = plan_shards(tenants, shard_size)
+
+    tmp_path = f"{manifest_path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"tenant_ids": tenant_ids, "shard_size": shard_size, "shards": shards},
+                  f, indent=2, sort_keys=True)
+    try:
+        os.link(tmp_path, manifest_path)
+    except FileExistsError:
+        print("Another node created the shard plan first, using it")
+        return _read_manifest(manifest_path, tenant_ids, shard_size)
+    finally:
+        os.remove(tmp_path)
+    return shards
+
+
+def is_node_shard(shard_id: str, node_index: int, node_count: int) -> bool:
+    """Assign shards to hosts by a stable hash of the shard id"""
+    return zlib.crc32(shard_id.encode("utf-8")) % node_count == node_index
+
+
+def _read_shard(checkpoint_dir: str, shard_id: str) -> Optional[Dict[str, any]]:
+    path = _shard_path(checkpoint_dir, shard_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def pending_shards(shards: List[Dict[str, any]], checkpoint_dir: str,
+                   node_index: int = 0, node_count: int = 1,
+                   max_attempts: int = 3) -> List[Dict[str, any]]:
+    """Shards of this node that were never checkpointed, or have failed subscriptions left to retry"""
+    pending = []
+    for shard in shards:
+        if not is_node_shard(shard["shard_id"], node_index, node_count):
+            continue
+        checkpoint = _read_shard(checkpoint_dir, shard["shard_id"])
+        if checkpoint is None or (checkpoint["failed"] and checkpoint["attempts"] < max_attempts):
+            pending.append(shard)
+    return pending
+
+
+def _init_worker(tenants: List[Dict[str, str]]) -> None:
+    global _worker_tenants
+    _worker_tenants = {tenant["tenant_id"]: tenant for tenant in tenants}
+
+
+def _failure(result: Dict[str, any]) -> Optional[str]:
+    """Why a subscription result should be retried, or None when every check completed"""
+    if "error" in result:
+        return result["error"]
+    for section, check in result.items():
+        if check.get("status") == "Failed":
+            return f"{section} failed: {check.get('error')}"
+    return None
+
+
+def scan_shard(shard: Dict[str, any], checkpoint_dir: str, expand_groups: bool = False) -> Dict[str, any]:
+    """Scan the subscriptions of a shard and checkpoint the results
+
+    Every subscription is checkpointed, including ones with failed checks, which
+    are listed under "failed" with the reason. Resuming rescans only those, and
+    the attempt count lets the sweep stop retrying checks that keep failing.
+    """
+    shard_id = shard["shard_id"]
+    try:
+        checkpoint = _read_shard(checkpoint_dir, shard_id) or {
+            "shard_id": shard_id,
+            "tenant_id": shard["tenant_id"],
+            "attempts": 0,
+            "failed": {},
+            "results": {}
+        }
+        tenant = _worker_tenants[shard["tenant_id"]]
+        azure_ops = AzureOperations(_authenticator(tenant), expand_groups=expand_groups)
+
+        for subscription_id in shard["subscriptions"]:
+            if subscription_id in checkpoint["results"] and subscription_id not in checkpoint["failed"]:
+                continue
+            result = azure_ops.analyze_subscription_security(subscription_id)
+            checkpoint["results"][subscription_id] = result
+            failure = _failure(result)
+            if failure:
+                checkpoint["failed"][subscription_id] = failure
+            else:
+                checkpoint["failed"].pop(subscription_id, None)
+
+        checkpoint["attempts"] += 1
+        _write_json(_shard_path(checkpoint_dir, shard_id), checkpoint)
+        return {
+            "shard_id": shard_id,
+            "status": "Partial" if checkpoint["failed"] else "Completed",
+            "attempts": checkpoint["attempts"],
+            "failed": checkpoint["failed"]
+        }
+    except Exception as e:
+        return {"shard_id": shard_id, "status": "Failed", "error": str(e)}
+
+
+def _scan_shard_task(args) -> Dict[str, any]:
+    return scan_shard(*args)
+
+
+def run_sweep(tenants: List[Dict[str, str]], checkpoint_dir: str, workers: int = 4,
+              shard_size: int = 10, node_index: int = 0, node_count: int = 1,
+              max_attempts: int = 3, expand_groups: bool = False) -> List[Dict[str, any]]:
+    """Scan this node's pending shards with a pool of worker processes
+
+    Outcomes are "Completed", "Partial" when some subscriptions have failed
+    checks, or "Failed" when the shard could not be checkpointed at all.
+    """
+    if shard_size < 1:
+        raise ValueError("shard_size must be at least 1")
+    if node_count < 1 or not 0 <= node_index < node_count:
+        raise ValueError("node_index must be between 0 and node_count - 1")
+    if max_attempts < 1:
+        raise ValueError("max_attempts must be at least 1")
+
+    shards = load_or_plan(checkpoint_dir, tenants, shard_size)
+    pending = pending_shards(shards, checkpoint_dir, node_index, node_count, max_attempts)
+    print(f"{len(pending)} of {len(shards)} shards pending on node {node_index}/{node_count}")
+    if not pending:
+        return []
+
+    outcomes = []
+    with Pool(processes=workers, initializer=_init_worker, initargs=(tenants,)) as pool:
+        tasks = [(shard, checkpoint_dir, expand_groups) for shard in pending]
+        for outcome in pool.imap_unordered(_scan_shard_task, tasks):
+            if outcome["status"] == "Completed":
+                print(f"Shard {outcome['shard_id']} completed")
+            elif outcome["status"] == "Partial":
+                print(f"Shard {outcome['shard_id']} has failed checks after attempt "
+                      f"{outcome['attempts']} of {max_attempts}:")
+                for subscription_id, failure in sorted(outcome["failed"].items()):
+                    print(f"  {subscription_id}: {failure}")
+            else:
+                print(f"Shard {outcome['shard_id']} failed: {outcome['error']}")
+            outcomes.append(outcome)
+    return sorted(outcomes, key=lambda o: o["shard_id"])
+
+
+def merge_shards(checkpoint_dir: str) -> Dict[str, any]:
+    """Merge every checkpointed shard into one result set keyed by subscription id
+
+    Shards are merged in shard id order and the first result of a subscription
+    wins, so the merged output does not depend on which worker finished first.
+    Subscriptions with failed checks are merged with those sections marked
+    Failed. The output has the same shape as `main.py scan`, so it can be diffed
+    directly.
+    """
+    with open(os.path.join(checkpoint_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        shards = json.load(f)["shards"]
+
+    merged = {}
+    missing = []
+    for shard in sorted(shards, key=lambda s: s["shard_id"]):
+        path = _shard_path(checkpoint_dir, shard["shard_id"])
+        if not os.path.exists(path):
+            missing.append(shard["shard_id"])
+            continue
+        with open(path, encoding="utf-8") as f:
+            results = json.load(f)["results"]
+        for subscription_id in sorted(results):
+            merged.setdefault(subscription_id, results[subscription_id])
+
+    if missing:
+        print(f"Merged without {len(missing)} incomplete shards: {', '.join(missing)}")
+    return dict(sorted(merged.items()))
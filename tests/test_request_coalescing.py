@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+import request_coalescing
+from request_coalescing import SingleFlight, coalesced_get
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    calls = []
+    start = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return "result"
+
+    results = []
+
+    def caller():
+        start.wait()
+        results.append(flight.do("key", fetch))
+
+    threads = [threading.Thread(target=caller) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["result"] * 10
+
+
+def test_calls_after_completion_are_not_cached():
+    flight = SingleFlight()
+    calls = []
+    flight.do("key", lambda: calls.append(1))
+    flight.do("key", lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_errors_are_raised_and_not_kept():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+
+
+def test_requests_without_authorization_bypass_coalescing(monkeypatch):
+    sent = []
+    monkeypatch.setattr(request_coalescing.requests, "get",
+                        lambda url, headers=None, **kwargs: sent.append(headers) or "response")
+    monkeypatch.setattr(request_coalescing.flight, "do",
+                        lambda key, fn: pytest.fail("unauthenticated request was coalesced"))
+
+    assert coalesced_get("https://graph.microsoft.com/v1.0/x", headers={}, scope="tenant/client/graph") == "response"
+    assert sent == [{}]
@@ -0,0 +1,98 @@
+from scan_diff import diff_scans, diff_tenant_scans, format_diff, has_changes, recommendation_name
+
+
+def make_results(privileged=(), tiers=None, high=()):
+    return {
+        "Microsoft Defender": {
+            "status": "Completed",
+            "details": [{"name": name, "tier": tier} for name, tier in (tiers or {}).items()]
+        },
+        "Security Center": {
+            "status": "Completed",
+            "recommendations": {"high_priority": list(high), "medium_priority": [], "low_priority": []}
+        },
+        "RBAC Settings": {
+            "status": "Completed",
+            "details": {"privileged": list(privileged), "normal": []}
+        }
+    }
+
+
+def assignment(principal_id, name, scope="/subscriptions/s1", role="Owner"):
+    return {"role": role, "principalId": principal_id, "principalName": name,
+            "principalType": "ServicePrincipal", "scope": scope}
+
+
+def test_recommendation_name_strips_resource_count():
+    assert recommendation_name("MFA should be enabled (3 resources)") == "MFA should be enabled"
+    assert recommendation_name("MFA should be enabled") == "MFA should be enabled"
+
+
+def test_identical_scans_have_no_changes():
+    results = make_results([assignment("p1", "sp-deploy")], {"VirtualMachines": "Standard"}, ["A (2 resources)"])
+    assert not has_changes(diff_scans(results, results))
+
+
+def test_privileged_assignments_added_and_removed():
+    old = make_results([assignment("p1", "alice"), assignment("p2", "bob")])
+    new = make_results([assignment("p2", "bob"), assignment("p3", "carol")])
+    diff = diff_scans(old, new)
+    assert [a["principalName"] for a in diff["privileged_added"]] == ["carol"]
+    assert [a["principalName"] for a in diff["privileged_removed"]] == ["alice"]
+
+
+def test_renamed_principal_is_not_a_change():
+    old = make_results([assignment("abc-1", "sp-deploy")])
+    new = make_results([dict(assignment("abc-1", "abc-1"), principalType="Unknown")])
+    assert not has_changes(diff_scans(old, new))
+
+
+def test_same_role_at_two_scopes_is_tracked_separately():
+    sub_scope = assignment("p1", "alice", scope="/subscriptions/s1")
+    rg_scope = assignment("p1", "alice", scope="/subscriptions/s1/resourceGroups/rg")
+    diff = diff_scans(make_results([sub_scope, rg_scope]), make_results([sub_scope]))
+    assert diff["privileged_removed"] == [rg_scope]
+    assert diff["privileged_added"] == []
+
+
+def test_scans_without_principal_ids_match_by_name():
+    old = make_results([{"role": "Owner", "principalName": "alice", "principalType": "User"}])
+    new = make_results([assignment("p1", "alice")])
+    assert diff_scans(old, new)["privileged_added"] == []
+
+
+def test_defender_downgrade_and_upgrade():
+    old = make_results(tiers={"VirtualMachines": "Standard", "SqlServers": "Free", "KeyVaults": "Standard"})
+    new = make_results(tiers={"VirtualMachines": "Free", "SqlServers": "Standard", "KeyVaults": "Standard"})
+    diff = diff_scans(old, new)
+    assert diff["defender_downgraded"] == [{"name": "VirtualMachines", "old_tier": "Standard", "new_tier": "Free"}]
+    assert diff["defender_upgraded"] == [{"name": "SqlServers", "old_tier": "Free", "new_tier": "Standard"}]
+
+
+def test_recommendations_ignore_resource_counts():
+    old = make_results(high=["A (3 resources)", "B (1 resources)"])
+    new = make_results(high=["A (5 resources)", "C (2 resources)"])
+    diff = diff_scans(old, new)
+    assert diff["recommendations_new"]["high"] == ["C"]
+    assert diff["recommendations_resolved"]["high"] == ["B"]
+
+
+def test_failed_sections_are_skipped():
+    old = make_results([assignment("p1", "alice")])
+    new = make_results()
+    new["RBAC Settings"] = {"status": "Failed", "error": "429"}
+    diff = diff_scans(old, new)
+    assert diff["privileged_removed"] == []
+    assert diff["skipped"] == ["RBAC Settings"]
+    assert "? Skipped RBAC Settings: check failed in one of the scans" in format_diff(diff)
+
+
+def test_tenant_diff_lists_added_removed_and_failed_subscriptions():
+    results = make_results()
+    old = {"s1": results, "s2": results, "s3": results}
+    new = {"s1": results, "s3": {"error": "Failed to get authentication headers"}, "s4": results}
+    diff = diff_tenant_scans(old, new)
+    assert diff["subscriptions_added"] == ["s4"]
+    assert diff["subscriptions_removed"] == ["s2"]
+    assert diff["subscriptions_failed"] == ["s3"]
+    assert list(diff["subscriptions"]) == ["s1"]
@@ -0,0 +1,86 @@
+from search_index import SearchIndex
+
+
+def make_results(principals=(), high=()):
+    return {
+        "RBAC Settings": {
+            "status": "Completed",
+            "details": {
+                "privileged": [
+                    {"role": "Owner", "principalId": f"id-{name}", "principalName": name,
+                     "principalType": "ServicePrincipal"}
+                    for name in principals
+                ],
+                "normal": []
+            }
+        },
+        "Security Center": {
+            "status": "Completed",
+            "recommendations": {"high_priority": list(high), "medium_priority": [], "low_priority": []}
+        }
+    }
+
+
+def subscription(sub_id, tags=None):
+    return {"id": sub_id, "name": f"Sub {sub_id}", "tags": tags or {}}
+
+
+def test_search_across_subscriptions():
+    index = SearchIndex()
+    index.add_subscription(subscription("s1"), make_results(["sp-deploy"]))
+    index.add_subscription(subscription("s2"), make_results(["sp-deploy", "sp-backup"]))
+    index.add_subscription(subscription("s3"), make_results(["sp-backup"]))
+
+    matches, total = index.search("owner sp deploy")
+    assert total == 2
+    assert [m["subscriptionId"] for m in matches] == ["s1", "s2"]
+
+
+def test_search_by_principal_id_tag_and_recommendation_prefix():
+    index = SearchIndex()
+    index.add_subscription(subscription("s1", {"env": "prod"}),
+                           make_results(["sp-deploy"], ["MFA should be enabled (3 resources)"]))
+
+    assert index.search("id-sp-deploy")[1] == 1
+    assert [m["kind"] for m in index.search("env prod")[0]] == ["tag"]
+    assert [m["text"] for m in index.search("mfa enab")[0]] == ["[high] MFA should be enabled (3 resources)"]
+    assert index.search("missing")[1] == 0
+    assert index.search("   ") == ([], 0)
+
+
+def test_search_limit_reports_total():
+    index = SearchIndex()
+    for i in range(10):
+        index.add_subscription(subscription(f"s{i}"), make_results(["sp-deploy"]))
+
+    matches, total = index.search("owner", limit=3)
+    assert len(matches) == 3
+    assert total == 10
+
+
+def test_reindex_replaces_documents_and_reuses_freed_ids():
+    index = SearchIndex()
+    index.add_subscription(subscription("s1", {"env": "prod"}), make_results(["alice", "bob"]))
+    size = len(index._documents)
+
+    for _ in range(5):
+        index.add_subscription(subscription("s1", {"env": "prod"}), make_results(["alice", "bob"]))
+    assert len(index._documents) == size
+    assert all(document is not None for document in index._documents)
+
+    index.add_subscription(subscription("s1"), make_results(["carol"]))
+    assert index.search("bob")[1] == 0
+    assert index.search("env")[1] == 0
+    assert index.search("carol")[1] == 1
+
+
+def test_remove_subscription():
+    index = SearchIndex()
+    index.add_subscription(subscription("s1"), make_results(["alice"]))
+    index.add_subscription(subscription("s2"), make_results(["alice"]))
+
+    index.remove_subscription("s1")
+    matches, total = index.search("alice")
+    assert total == 1
+    assert matches[0]["subscriptionId"] == "s2"
+    assert len(index) == 1
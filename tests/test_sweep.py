@@ -0,0 +1,116 @@
+import json
+import os
+
+import pytest
+
+import sweep
+
+TENANTS = [{"tenant_id": "t1", "client_id": "client", "client_secret": "secret"}]
+
+
+class FakeOperations:
+    """Stands in for AzureOperations, Security Center always fails for sub03"""
+
+    subscriptions = ["sub01", "sub02", "sub03", "sub04", "sub05"]
+    list_error = None
+
+    def __init__(self, authenticator, expand_groups=False):
+        pass
+
+    def list_subscriptions(self):
+        if self.list_error:
+            raise self.list_error
+        return [{"id": sub_id, "name": sub_id, "tags": {}} for sub_id in self.subscriptions]
+
+    def analyze_subscription_security(self, subscription_id):
+        status = "Failed" if subscription_id == "sub03" else "Completed"
+        return {"Security Center": {"status": status, "error": "403"}}
+
+
+@pytest.fixture
+def fake_azure(monkeypatch):
+    monkeypatch.setattr(sweep, "AzureOperations", FakeOperations)
+    monkeypatch.setattr(sweep, "_authenticator", lambda tenant: None)
+    sweep._init_worker(TENANTS)
+    return FakeOperations
+
+
+def test_plan_is_deterministic_and_written_once(tmp_path, fake_azure):
+    shards = sweep.load_or_plan(str(tmp_path), TENANTS, 2)
+    assert [s["subscriptions"] for s in shards] == [["sub01", "sub02"], ["sub03", "sub04"], ["sub05"]]
+    assert sweep.load_or_plan(str(tmp_path), TENANTS, 2) == shards
+    assert sorted(os.listdir(tmp_path)) == [sweep.MANIFEST_FILE]
+
+
+def test_reused_plan_with_other_shard_size_is_refused(tmp_path, fake_azure):
+    sweep.load_or_plan(str(tmp_path), TENANTS, 2)
+    with pytest.raises(RuntimeError):
+        sweep.load_or_plan(str(tmp_path), TENANTS, 3)
+
+
+def test_listing_error_writes_no_plan(tmp_path, fake_azure, monkeypatch):
+    monkeypatch.setattr(FakeOperations, "list_error", RuntimeError("429"))
+    with pytest.raises(RuntimeError):
+        sweep.load_or_plan(str(tmp_path), TENANTS, 2)
+    assert not os.path.exists(tmp_path / sweep.MANIFEST_FILE)
+
+
+def test_tenant_without_subscriptions_gets_no_shards(tmp_path, fake_azure, monkeypatch):
+    monkeypatch.setattr(FakeOperations, "subscriptions", [])
+    assert sweep.load_or_plan(str(tmp_path), TENANTS, 2) == []
+
+
+def test_failing_check_does_not_drop_neighbours(tmp_path, fake_azure):
+    checkpoint_dir = str(tmp_path)
+    shards = sweep.load_or_plan(checkpoint_dir, TENANTS, 3)
+
+    statuses = []
+    for _ in range(5):
+        pending = sweep.pending_shards(shards, checkpoint_dir, max_attempts=3)
+        statuses.append([sweep.scan_shard(shard, checkpoint_dir)["status"] for shard in pending])
+    assert statuses == [["Partial", "Completed"], ["Partial"], ["Partial"], [], []]
+
+    merged = sweep.merge_shards(checkpoint_dir)
+    assert list(merged) == ["sub01", "sub02", "sub03", "sub04", "sub05"]
+    assert merged["sub03"]["Security Center"]["status"] == "Failed"
+
+
+def test_retry_rescans_only_failed_subscriptions(tmp_path, fake_azure, monkeypatch):
+    checkpoint_dir = str(tmp_path)
+    shard = sweep.load_or_plan(checkpoint_dir, TENANTS, 5)[0]
+    sweep.scan_shard(shard, checkpoint_dir)
+
+    scanned = []
+    original = FakeOperations.analyze_subscription_security
+    monkeypatch.setattr(FakeOperations, "analyze_subscription_security",
+                        lambda self, sub_id: scanned.append(sub_id) or original(self, sub_id))
+    sweep.scan_shard(shard, checkpoint_dir)
+    assert scanned == ["sub03"]
+
+
+def test_pending_shards_split_across_nodes(tmp_path, fake_azure):
+    shards = sweep.load_or_plan(str(tmp_path), TENANTS, 1)
+    per_node = [
+        {s["shard_id"] for s in sweep.pending_shards(shards, str(tmp_path), node_index, 3)}
+        for node_index in range(3)
+    ]
+    assert set.union(*per_node) == {s["shard_id"] for s in shards}
+    assert sum(len(ids) for ids in per_node) == len(shards)
+
+
+def test_merge_is_ordered_and_skips_missing_shards(tmp_path):
+    shards = [
+        {"shard_id": "t1-0000", "tenant_id": "t1", "subscriptions": ["b", "a"]},
+        {"shard_id": "t1-0001", "tenant_id": "t1", "subscriptions": ["c"]},
+        {"shard_id": "t2-0000", "tenant_id": "t2", "subscriptions": ["a"]}
+    ]
+    with open(tmp_path / sweep.MANIFEST_FILE, "w") as f:
+        json.dump({"tenant_ids": ["t1", "t2"], "shard_size": 2, "shards": shards}, f)
+    for shard_id, results in [("t2-0000", {"a": {"from": "t2"}}),
+                              ("t1-0000", {"b": {"from": "t1"}, "a": {"from": "t1"}})]:
+        with open(tmp_path / f"shard-{shard_id}.json", "w") as f:
+            json.dump({"shard_id": shard_id, "attempts": 1, "failed": {}, "results": results}, f)
+
+    merged = sweep.merge_shards(str(tmp_path))
+    assert list(merged) == ["a", "b"]
+    assert merged["a"] == {"from": "t1"}